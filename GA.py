@@ -11,6 +11,7 @@ dependencies:
     numpy
     multiprocessing
     qiskit_algorithms
+    qiskit_aer
 
 
 '''
@@ -18,41 +19,55 @@ import qiskit as qk
 import numpy as np
 import multiprocessing as mp
 from qiskit_algorithms import optimizers
+from qiskit.quantum_info import Statevector
+from qiskit_aer import AerSimulator
 import os
 from gene import Gene_Circuit
 from functools import partial
-import transform
 mp.set_start_method('spawn',True)
 
-def get_prob_distribution(circuit : qk.QuantumCircuit, theta : list|np.ndarray, method : str = 'qasm') -> np.ndarray:
+#the GPU backend of this process, created once by _get_backend
+_BACKEND = None
+#the GPU is only used for circuits with at least _GPU_MIN_QUBIT qubits,
+#for smaller circuits the overhead of the GPU is larger than the simulation
+_GPU_MIN_QUBIT = 12
+
+def _get_backend() -> AerSimulator:
+    '''
+    get the GPU statevector backend with cuStateVec of this process
+    the backend is created at the first call and reused after
+    Returns:
+        backend: the GPU backend
+    '''
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = AerSimulator(method='statevector', device='GPU', cuStateVec_enable=True)
+    return _BACKEND
+
+def _init_worker(GPU : bool) -> None:
+    '''
+    initialize a worker process of the pool, create the backend once for all the genes evaluated by this process
+    Args:
+        GPU: if the computer have an avaliable gpu
+    Returns:
+        None
+    '''
+    if GPU:
+        _get_backend()
+
+def get_prob_distribution(circuit : qk.QuantumCircuit, theta : list|np.ndarray) -> np.ndarray:
     '''
     Get the probability distribution of a circuit
+    the distribution is computed exactly from the statevector of the circuit
     Args:
         circuit: a quantum circuit
         theta: a list of theta
-        method: the method to get the probability distribution. Default: 'qasm'
     Returns:
         prob_distribution: the probability distribution of the circuit
     '''
-    circuit = circuit.bind_parameters({circuit.parameters[i]:theta[i] for i in range(len(theta))})
-    num_qubits = circuit.num_qubits
-    if method == 'qasm':
-        circuit.measure_all()
-        backend = qk.Aer.get_backend('qasm_simulator')
-        job = qk.execute(circuit, backend, shots=1000)
-        result = job.result()
-        counts = result.get_counts()
-        prob_distribution = np.zeros(2**num_qubits)
-        for key in counts.keys():
-            prob_distribution[int(key, 2)] = counts[key]/1000
-    elif method == 'statevector':
-        backend = qk.Aer.get_backend('statevector_simulator')
-        job = qk.execute(circuit, backend)
-        result = job.result()
-        statevector = result.get_statevector()
-        prob_distribution = transform.statevector2prob(statevector)
-    else:
-        raise Exception('method should be qasm or statevector')
+    circuit = circuit.assign_parameters(theta, inplace=False)
+    statevector = Statevector.from_instruction(circuit).data
+    prob_distribution = np.abs(statevector)**2
     return prob_distribution
 
 #define the fidelity function
@@ -60,29 +75,59 @@ def get_fidelity(statevector : np.ndarray, target_statevector : np.ndarray) -> f
     '''
     Get the fidelity of a statevector
     Args:
-        statevector: the statevector of the circuit
+        statevector: the statevector of the circuit, or a batch of statevectors with shape (batch, 2**num_qubit)
         target_statevector: the target statevector
     Returns:
-        fidelity: the fidelity of the statevector
+        fidelity: the fidelity of the statevector, a array with shape (batch,) for a batch of statevectors
     '''
-    fidelity = np.abs(np.dot(np.conj(np.array(statevector)), target_statevector))**2
+    statevector = np.asarray(statevector)
+    if statevector.ndim == 2:
+        return np.abs(statevector @ np.conj(target_statevector))**2
+    #np.vdot conjugate the first argument without allocating a new array
+    fidelity = np.abs(np.vdot(target_statevector, statevector))**2
     return fidelity
 
-def _statevector(Gene : Gene_Circuit, theta : np.ndarray, backend : qk.providers.backend) -> np.ndarray:
+def _statevector(Gene : Gene_Circuit, theta : np.ndarray, backend : qk.providers.backend = None) -> np.ndarray:
     '''
     Get the statevector of a circuit
+    a batch of theta is evaluated in one job
     Args:
         Gene : Gene_Circuit
+        theta: a list of theta, or a array of theta with shape (batch, num_parameters)
+        backend: the backend of the circuit. Default: None, evaluate with qiskit.quantum_info.Statevector
+    Returns:
+        statevector: the statevector of the circuit, with shape (batch, 2**num_qubit) if theta is a batch
+    '''
+    circuits = [Gene.bind_parameters(t) for t in np.atleast_2d(theta)]
+    if backend is None:
+        statevector = np.array([Statevector.from_instruction(circuit).data for circuit in circuits])
+    else:
+        for circuit in circuits:
+            circuit.save_statevector()
+        job = backend.run(circuits)
+        result = job.result()
+        statevector = np.array([np.asarray(result.get_statevector(k)) for k in range(len(circuits))])
+    if np.ndim(theta) == 2:
+        return statevector
+    return statevector[0]
+
+def _fidelity_gradient(statevector : callable, theta : np.ndarray, target_statevector : np.ndarray) -> np.ndarray:
+    '''
+    Get the gradient of the fidelity with the parameter shift rule
+    each parameter is the angle of one rotation gate, so the gradient is exact
+        dF/dtheta_k = (F(theta + pi/2 e_k) - F(theta - pi/2 e_k))/2
+    all the shifted theta are evaluated in one batch
+    Args:
+        statevector: a function map a batch of theta to the statevectors of the circuit
         theta: a list of theta
-        backend: the backend of the circuit
+        target_statevector: the target statevector
     Returns:
-        statevector: the statevector of the circuit
+        gradient: the gradient of the fidelity
     '''
-    circuit = Gene.bind_parameters(theta)
-    job = qk.execute(circuit, backend)
-    result = job.result()
-    statevector = result.get_statevector()
-    return statevector
+    theta = np.asarray(theta, dtype=float)
+    shift = np.eye(len(theta))*np.pi/2
+    fidelity = get_fidelity(statevector(np.concatenate((theta+shift, theta-shift))), target_statevector)
+    return (fidelity[:len(theta)] - fidelity[len(theta):])/2
 
 def _get_optimized_fidelity(Gene : Gene_Circuit, target_statevector:np.ndarray ,**kwargs) -> (float, int, np.ndarray):
     '''
@@ -92,7 +137,7 @@ def _get_optimized_fidelity(Gene : Gene_Circuit, target_statevector:np.ndarray ,
         target_statevector: the target statevector
     
     kwargs:
-        optimizer: the optimizer of the circuit. Default: optimizers.SPSA(maxiter=1000)
+        optimizer: the optimizer of the circuit. Default: optimizers.L_BFGS_B(maxiter=100)
         GPU: if the computer have an avaliable gpu. Default: False
         initial_point: the initial point of the optimizer. Default: np.random.rand(num_parameters)
 
@@ -101,11 +146,11 @@ def _get_optimized_fidelity(Gene : Gene_Circuit, target_statevector:np.ndarray ,
         depth: the depth of the circuit
         theta: the optimized theta
     '''
+    #only the GPU run needs an Aer job, the CPU run evaluate the statevector in process
     if kwargs['GPU']:
-        backend = qk.Aer.get_backend('statevector_simulator')
-        backend.set_options(device='GPU')
+        backend = _get_backend()
     else:
-        backend = qk.Aer.get_backend('statevector_simulator')
+        backend = None
 
     num_parameters = Gene.num_parameters
     if 'initial_point' in kwargs.keys():
@@ -115,31 +160,43 @@ def _get_optimized_fidelity(Gene : Gene_Circuit, target_statevector:np.ndarray ,
     try:
         optimizer = kwargs['optimizer']
     except:
-        optimizer = optimizers.SPSA(maxiter=1000)
-    #define the loss function
+        optimizer = optimizers.L_BFGS_B(maxiter=100)
+    #the CPU run use the numpy kernel of Gene_Circuit
+    if backend is None:
+        statevector = Gene.statevector
+    else:
+        statevector = partial(_statevector, Gene, backend=backend)
+    #define the loss function, a batch of theta is evaluated in one call of statevector
     def loss(theta):
-        fidelity = get_fidelity(_statevector(Gene, theta, backend), target_statevector)
+        fidelity = get_fidelity(statevector(theta), target_statevector)
         loss = -fidelity
         return loss
-    
-    theta = optimizer.minimize(loss, x0=theta)
+    def gradient(theta):
+        return -_fidelity_gradient(statevector, theta, target_statevector)
+
+    #SPSA evaluate theta+c*delta and theta-c*delta in one batch
+    if isinstance(optimizer, optimizers.SPSA):
+        optimizer.set_max_evals_grouped(2)
+    #the optimizer can not run without parameter
+    if num_parameters > 0:
+        theta = optimizer.minimize(loss, x0=theta, jac=gradient).x
     #get the optimized probability distribution
-    fidelity=get_fidelity(_statevector(Gene, theta.x, backend), target_statevector)
+    fidelity=get_fidelity(statevector(theta), target_statevector)
     depth=Gene.depth()
-    # print(fidelity,depth,theta.x)
-    return fidelity,depth,theta.x
+    # print(fidelity,depth,theta)
+    return fidelity,depth,theta
 
 
 def _get_fidelity_depth(gene : list, **kwargs ) -> (float, int, np.ndarray):
     '''
     this function is used to get the fidelity and depth of a gene
     Args:
-        gene: a array with shape (num_qubit, length_gene) with element called G_ij
+        gene: a uint8 array with shape (num_qubit, length_gene, 2) with element called G_ij
 
     kwargs:
         num_qubit: number of qubits
         target_statevector: the target statevector
-        optimizer: the optimizer of the circuit. Default: optimizers.SPSA(maxiter=1000)
+        optimizer: the optimizer of the circuit. Default: optimizers.L_BFGS_B(maxiter=100)
 
     Returns:
         fidelity: the fidelity of the gene
@@ -157,7 +214,7 @@ def _get_fidelity_depth(gene : list, **kwargs ) -> (float, int, np.ndarray):
     try:
         optimizer = kwargs['optimizer']
     except:
-        optimizer = optimizers.SPSA(maxiter=1000)
+        optimizer = optimizers.L_BFGS_B(maxiter=100)
     
     Gene = Gene_Circuit(gene, num_qubit)
     # print(gene)
@@ -170,7 +227,53 @@ def _get_fidelity_depth(gene : list, **kwargs ) -> (float, int, np.ndarray):
     return fidelity,depth,theta
 
 
-def _get_index(result : np.ndarray,threshold :float = 0.9) -> np.ndarray:
+def _collect_result(results : list) -> dict:
+    '''
+    collect the result of each gene into typed arrays
+    Args:
+        results: a list of (fidelity, depth, theta) of each gene
+    Returns:
+        result: a dict with
+                    fidelity: a float64 array with shape (num_genes,)
+                    depth: a int32 array with shape (num_genes,)
+                    theta: a object array with shape (num_genes,), the length of theta is different for each gene
+    '''
+    theta = np.empty(len(results),dtype=object)
+    for j,r in enumerate(results):
+        theta[j] = r[2]
+    result = {'fidelity':np.fromiter((r[0] for r in results),dtype=np.float64,count=len(results)),
+              'depth':np.fromiter((r[1] for r in results),dtype=np.int32,count=len(results)),
+              'theta':theta}
+    return result
+
+
+def _select_result(result : dict, index : np.ndarray) -> dict:
+    '''
+    get the result of the genes in index
+    Args:
+        result: the result of the genetic algorithm
+        index: the index of the genes
+    Returns:
+        result: the result of the genes in index
+    '''
+    return {key:value[index] for key,value in result.items()}
+
+
+def _load_result(filename : str, keys : tuple = ('fidelity','depth','theta')) -> dict:
+    '''
+    load the result saved by _save_data
+    the fields of a .npz file are read lazily, the fields not in keys are not read from the file
+    Args:
+        filename: the filename of the .npz file
+        keys: the fields to load. Default: ('fidelity','depth','theta')
+    Returns:
+        result: the result of the genetic algorithm
+    '''
+    with np.load(filename, allow_pickle=True) as data:
+        return {key:data[key] for key in keys}
+
+
+def _get_index(result : dict,threshold :float = 0.9) -> np.ndarray:
     '''
     get the index of 10 genes with the smallest depth and fidelity larger than threshold
     if there is less than 3 genes with fidelity larger than threshold, randomly choose and add 2 genes
@@ -186,35 +289,34 @@ def _get_index(result : np.ndarray,threshold :float = 0.9) -> np.ndarray:
     '''
     if not(0<threshold<1):
         raise ValueError('threshold should be between 0 and 1')
-    
-    ii = 0 #the fidelity threshold
-    while (True and ii<100):
-        # find the gene with the fidelity larger than 0.99
-        gene = result[:,0]>0.99 - 0.01*ii
-        ii += 1
-        if np.sum(gene)>=6:
-            break
-        elif 0.99 - 0.01*ii<threshold:
-            if np.sum(gene)>3:
-                break
-            elif np.sum(gene)>0:
-                #randomly choose 2 genes
-                gene[np.random.randint(0,len(gene))]=True
-                gene[np.random.randint(0,len(gene))]=True
-                break
-            else:
-                raise Exception('No gene with fidelity larger than threshold')
-    index=np.array([]).astype(int)
-    #get the index of 10 genes with the smallest depth and fidelity larger than 0.99
-    for j in np.argsort(result[:,1]):
-        if gene[j]:
-            index=np.append(index,j)
-            if len(index)==10:
-                break
+    fidelity = result['fidelity']
+    #the filters of fidelity 0.99, 0.98, ..., lower the filter until 6 genes pass
+    filters = 0.99 - 0.01*np.arange(100)
+    #the last filter before the next filter fall below threshold
+    last = np.argmax(0.99 - 0.01*np.arange(1,101) < threshold)
+    #the first filter passed by 6 genes is the first filter below the 6th largest fidelity
+    first = last+1
+    if len(fidelity)>=6:
+        sixth = np.partition(fidelity,len(fidelity)-6)[len(fidelity)-6]
+        if np.any(filters<sixth):
+            first = np.argmax(filters<sixth)
+    if first<=last:
+        gene = fidelity>filters[first]
+    else:
+        gene = fidelity>filters[last]
+        if np.sum(gene)==0:
+            raise Exception('No gene with fidelity larger than threshold')
+        elif np.sum(gene)<=3:
+            #randomly choose 2 genes
+            gene[np.random.randint(0,len(gene))]=True
+            gene[np.random.randint(0,len(gene))]=True
+    #get the index of 10 genes with the smallest depth and fidelity larger than the filter
+    index = np.flatnonzero(gene)
+    index = index[np.argsort(result['depth'][index],kind='stable')][:10]
     return index
 
 
-def _best_gene(random_genes:np.ndarray,target_statevector:np.ndarray,result:np.ndarray,index:np.ndarray,num_qubit:int) -> dict:
+def _best_gene(random_genes:np.ndarray,target_statevector:np.ndarray,result:dict,index:np.ndarray,num_qubit:int) -> dict:
     '''
     this function is used to get the best gene
     Args:
@@ -227,12 +329,12 @@ def _best_gene(random_genes:np.ndarray,target_statevector:np.ndarray,result:np.n
         dict_best_gene: the best gene
     '''
     gene=random_genes[index[0]]
-    theta = result[index[0],2]
+    theta = result['theta'][index[0]]
     dict_best_gene = {'target':target_statevector,
                       'gene':gene,
-                      'depth':result[index[0],1],
-                      'fidelity':result[index[0],0],
-                      'theta':result[index[0],2],
+                      'depth':result['depth'][index[0]],
+                      'fidelity':result['fidelity'][index[0]],
+                      'theta':theta,
                       'num_qubit':num_qubit,
                       'circuit':Gene_Circuit(gene=gene,num_qubit=num_qubit).bind_parameters(theta)}
     return dict_best_gene
@@ -250,6 +352,23 @@ def _get_parent_gene(random_gene : np.ndarray, index : np.ndarray) -> np.ndarray
     return random_gene[index]
 
 
+def _random_gene(num_genes : int, num_qubit : int, length_gene : int, num_types : int) -> np.ndarray:
+    '''
+    this function is used to generate random genes
+    Args:
+        num_genes: number of genes
+        num_qubit: number of qubits
+        length_gene: length of gene
+        num_types: the number of types of the gate
+    Returns:
+        random_gene: a uint8 array with shape (num_genes, num_qubit, length_gene, 2), G_ij is (gate, control)
+    '''
+    random_gene = np.empty((num_genes, num_qubit, length_gene, 2), dtype=np.uint8)
+    random_gene[...,0] = np.random.randint(0, num_types, size=(num_genes, num_qubit, length_gene), dtype=np.uint8)
+    random_gene[...,1] = np.random.randint(0, num_qubit, size=(num_genes, num_qubit, length_gene), dtype=np.uint8)
+    return random_gene
+
+
 def _get_child_gene(random_gene:np.ndarray,parent_gene : np.ndarray,index :np.ndarray ,kwargs:dict) -> np.ndarray:
     '''
     this function is used to generate child gene
@@ -265,36 +384,34 @@ def _get_child_gene(random_gene:np.ndarray,parent_gene : np.ndarray,index :np.nd
     mutation_rate = kwargs['mutation_rate']
     num_qubit = kwargs['num_qubit']
     num_types = kwargs['num_types']
-    # child_gene = np.zeros((num_genes,length_gene)).astype(int)
-    child_gene = np.zeros((num_genes, num_qubit, length_gene, 2)).astype(int)
-    for j in range(num_genes):
-        #randomly choose a parent gene
-        parent = [np.random.randint(0,len(index)), np.random.randint(0,len(index))]
-        while parent[0]==parent[1]:
-            parent[1]=np.random.randint(0,len(index))
-        #randomly choose a crossover point
-        crossover_point = np.random.randint(1,length_gene-1)
-        #generate child gene
-        child_gene[j] = np.concatenate((parent_gene[parent[0]][:,:crossover_point,:], 
-                                        parent_gene[parent[1]][:,crossover_point:,:]), 
-                                        axis=1)
-        #randomly mutate the child gene
-        for k in range(num_qubit):
-            for l in range(length_gene):
-                if np.random.rand()<mutation_rate:
-                    child_gene[j][k][l]=(np.random.randint(0,num_types), np.random.randint(0,num_qubit))
+    #randomly choose two different parent genes for each child gene
+    parents = np.random.randint(0,len(index),size=(num_genes,2))
+    same = parents[:,0]==parents[:,1]
+    while np.any(same):
+        parents[same,1] = np.random.randint(0,len(index),size=np.sum(same))
+        same = parents[:,0]==parents[:,1]
+    #randomly choose a crossover point for each child gene
+    crossover_point = np.random.randint(1,length_gene-1,size=num_genes)
+    #generate child gene, the columns before the crossover point come from the first parent
+    crossover = np.arange(length_gene)[None,:] < crossover_point[:,None]
+    child_gene = np.empty((num_genes, num_qubit, length_gene, 2), dtype=np.uint8)
+    np.take(parent_gene, parents[:,1], axis=0, out=child_gene)
+    np.copyto(child_gene, np.take(parent_gene, parents[:,0], axis=0), where=crossover[:,None,:,None])
+    #randomly mutate the child gene
+    mutation = np.random.rand(num_genes, num_qubit, length_gene) < mutation_rate
+    num_mutation = np.sum(mutation)
+    child_gene[mutation] = np.stack((np.random.randint(0,num_types,size=num_mutation),
+                                     np.random.randint(0,num_qubit,size=num_mutation)),
+                                     axis=1)
 
     #randomly generate 10% genes
-    child_gene[num_genes-int(num_genes/10):] = np.concatenate(
-        (np.random.randint(low=0, high=num_types, size=(int(num_genes/10), num_qubit, length_gene, 1)), 
-         np.random.randint(low=0, high=num_qubit, size=(int(num_genes/10), num_qubit, length_gene, 1))), 
-        axis=3)
-    #add the 10 genes with the smallest depth
-    child_gene[num_genes-int(num_genes/10)-len(index):num_genes-int(num_genes/10)] = random_gene[index]
-    return child_gene.astype(int)
+    child_gene[num_genes-int(num_genes/10):] = _random_gene(int(num_genes/10), num_qubit, length_gene, num_types)
+    #add the 10 genes with the smallest depth, parent_gene is random_gene[index]
+    child_gene[num_genes-int(num_genes/10)-len(index):num_genes-int(num_genes/10)] = parent_gene
+    return child_gene
 
 
-def _save_data(result : np.ndarray, 
+def _save_data(result : dict, 
               random_gene : np.ndarray,
               generation : int,
               target_statevector : np.ndarray,
@@ -322,21 +439,70 @@ def _save_data(result : np.ndarray,
     experiment = kwargs['experiment']
     os.makedirs(f'{path}/{experiment}/{generation}st_generation',exist_ok=True)
     #save the result
-    if os.path.exists(f'{path}/{experiment}/{generation}st_generation/result.npy'):
-        print(f'{path}/{experiment}/{generation}st_generation/result.npy already exists')
+    if os.path.exists(f'{path}/{experiment}/{generation}st_generation/result.npz'):
+        print(f'{path}/{experiment}/{generation}st_generation/result.npz already exists')
     else:
-        np.save(f'{path}/{experiment}/{generation}st_generation/result.npy', result)
+        np.savez(f'{path}/{experiment}/{generation}st_generation/result.npz', **result)
     #save the random gene
     if os.path.exists(f'{path}/{experiment}/{generation}st_generation/random_gene.npy'):
         print(f'{path}/{experiment}/{generation}st_generation/random_gene.npy already exists')
     else:
         np.save(f'{path}/{experiment}/{generation}st_generation/random_gene.npy', random_gene)
     np.save(f'{path}/{experiment}/{generation}st_generation/10_smallest_depth_gene.npy', random_gene[index])
-    np.save(f'{path}/{experiment}/{generation}st_generation/10_smallest_depth_result.npy', result[index])
+    np.savez(f'{path}/{experiment}/{generation}st_generation/10_smallest_depth_result.npz', **_select_result(result,index))
     #save the best gene
     np.save(f'{path}/{experiment}/best_gene.npy', _best_gene(random_gene,target_statevector,result,index,num_qubit=num_qubit))
 
 
+def _gene_key(gene : np.ndarray) -> bytes:
+    '''
+    get the key of a gene in the cache
+    Args:
+        gene: a array with shape (num_qubit, length_gene, 2)
+    Returns:
+        key: the raw bytes of the gene
+    '''
+    return np.ascontiguousarray(gene, dtype=np.uint8).tobytes()
+
+
+def _load_cache(kwargs : dict) -> dict:
+    '''
+    this function is used to load the cache of evaluated genes
+    Args:
+        kwarg: the kwargs of the genetic algorithm
+    Returns:
+        cache: a dict map the key of a gene to (fidelity, depth, theta), empty if there is no cache file
+    '''
+    path = kwargs['path']
+    experiment = kwargs['experiment']
+    if not os.path.exists(f'{path}/{experiment}/cache.npz'):
+        return dict()
+    data = np.load(f'{path}/{experiment}/cache.npz', allow_pickle=True)
+    return {key:tuple(result) for key,result in zip(data['key'],data['result'])}
+
+
+def _save_cache(cache : dict, kwargs : dict) -> None:
+    '''
+    this function is used to save the cache of evaluated genes to {path}/{experiment}/cache.npz
+    Args:
+        cache: a dict map the key of a gene to (fidelity, depth, theta)
+        kwarg: the kwargs of the genetic algorithm
+    Returns:
+        None
+    '''
+    path = kwargs['path']
+    experiment = kwargs['experiment']
+    key = np.empty(len(cache),dtype=object)
+    result = np.empty((len(cache),3),dtype=object)
+    for j,(k,(fidelity,depth,theta)) in enumerate(cache.items()):
+        key[j] = k
+        #assign element by element, theta have different length for each gene
+        result[j,0] = fidelity
+        result[j,1] = depth
+        result[j,2] = theta
+    np.savez(f'{path}/{experiment}/cache.npz', key=key, result=result)
+
+
 def _gpu_avaliable() -> bool:
     '''
     check if the computer have an avaliable gpu
@@ -344,10 +510,7 @@ def _gpu_avaliable() -> bool:
         gpu_avaliable: if the computer have an avaliable gpu 
     '''
     try:
-        backend = qk.Aer.get_backend('statevector_simulator')
-        backend.set_options(device='GPU')
-        qk.execute(qk.QuantumCircuit(1),backend).result()
-        return True
+        return 'GPU' in AerSimulator().available_devices()
     except :
         return False
 
@@ -366,12 +529,12 @@ def GA(target_statevector : np.ndarray ,num_qubit : int ,**kwargs):
         cpu_count: the number of cpu used. Default: mp.cpu_count()
         path: the path to save the result. Default: data
         experiment: the name of the experiment. Default: test
-        optimizer: the optimizer of the circuit. Default: optimizers.SPSA(maxiter=1000)
+        optimizer: the optimizer of the circuit. Default: optimizers.L_BFGS_B(maxiter=100)
         maxiter: the number of max iteration. Default: 30
         miniter: the number of min iteration. Default: 10
         threshold: the threshold of the fidelity. Default: 0.90
         num_types: the number of types of the gate. Default: 7
-        GPU: if the computer have an avaliable gpu. Default: check if the computer have an avaliable gpu
+        GPU: if the computer have an avaliable gpu, only used when num_qubit >= 12. Default: check if the computer have an avaliable gpu
     Returns:
         None
     '''
@@ -381,7 +544,7 @@ def GA(target_statevector : np.ndarray ,num_qubit : int ,**kwargs):
                       'cpu_count':mp.cpu_count(),               
                       'path':'data',
                       'experiment':'test',
-                      'optimizer':optimizers.SPSA(maxiter=1000),
+                      'optimizer':optimizers.L_BFGS_B(maxiter=100),
                       'optimizer2':None,
                       'maxiter':30,
                       'miniter':10, 
@@ -403,40 +566,42 @@ def GA(target_statevector : np.ndarray ,num_qubit : int ,**kwargs):
     num_types = kwargs['num_types']
     miniter = kwargs['miniter']
     kwargs['num_qubit'] = num_qubit
+    GPU = kwargs['GPU'] and num_qubit>=_GPU_MIN_QUBIT
     #generate random gene
-    # random_gene = np.random.randint(0,num_types,num_genes*length_gene).reshape(num_genes,length_gene)
-    random_gene = np.concatenate((np.random.randint(low=0, high=num_types, size=(num_genes, num_qubit, length_gene, 1)), 
-                                  np.random.randint(low=0, high=num_qubit, size=(num_genes, num_qubit, length_gene, 1))), 
-                                  axis=3)
+    random_gene = _random_gene(num_genes, num_qubit, length_gene, num_types)
     #create a partial function for multiprocessing
     partial_get_fidelity_depth = partial(_get_fidelity_depth,
                                          num_qubit=num_qubit, 
                                          target_statevector=target_statevector, 
                                          optimizer=optimizer,
                                          optimizer2=optimizer2,
-                                         GPU = kwargs['GPU'])
+                                         GPU = GPU)
     os.makedirs(path,exist_ok=True)
     os.makedirs(f'{path}/{experiment}',exist_ok=True)
     np.save(f'{path}/{experiment}/target_statevector.npy', target_statevector)
     caculate = False
     record_depth = dict()
+    cache = _load_cache(kwargs)
+    #the pool is kept for all generations, the worker processes only start once
+    pool = mp.Pool(cpu_count, initializer=_init_worker, initargs=(GPU,))
     for i in range(maxiter):
         #check if the data exist
         if caculate:
             pass
-        elif os.path.exists(f'{path}/{experiment}/{i}st_generation/result.npy'):
+        elif os.path.exists(f'{path}/{experiment}/{i}st_generation/result.npz'):
             if os.path.exists(f'{path}/{experiment}/{i+1}st_generation/random_gene.npy'):
                 print(f'generation {i} finished')
-                result = np.load(f'{path}/{experiment}/{i}st_generation/result.npy', allow_pickle=True)
+                #only the fidelity and depth are needed, skip unpickling theta
+                result = _load_result(f'{path}/{experiment}/{i}st_generation/result.npz',keys=('fidelity','depth'))
                 index=_get_index(result,threshold=threshold)
-                record_depth[i%10] = np.array(result[index,1])
+                record_depth[i%10] = np.array(result['depth'][index])
                 continue
             else:
-                result = np.load(f'{path}/{experiment}/{i}st_generation/result.npy', allow_pickle=True)
-                random_gene = np.load(f'{path}/{experiment}/{i}st_generation/random_gene.npy', allow_pickle=True)
+                result = _load_result(f'{path}/{experiment}/{i}st_generation/result.npz')
+                random_gene = np.load(f'{path}/{experiment}/{i}st_generation/random_gene.npy', allow_pickle=True).astype(np.uint8)
                 index=_get_index(result,threshold=threshold)
-                record_depth[i%10] = np.array(result[index,1])
-                print(f'depth:{result[index,1]}\nfidelity:{result[index,0]}')
+                record_depth[i%10] = np.array(result['depth'][index])
+                print(f'depth:{result["depth"][index]}\nfidelity:{result["fidelity"][index]}')
                 #save the result
                 _save_data(result,random_gene,i,target_statevector,index,num_qubit,kwargs)
                 parent = _get_parent_gene(random_gene,index)
@@ -447,19 +612,25 @@ def GA(target_statevector : np.ndarray ,num_qubit : int ,**kwargs):
         else:
             caculate = True
         os.makedirs(f'{path}/{experiment}/{i}st_generation',exist_ok=True)
+        #only evaluate the genes which are not in the cache (e.g. the parents kept from last generation)
+        keys = [_gene_key(gene) for gene in random_gene]
+        uncached = dict()
+        for key,gene in zip(keys,random_gene):
+            if key not in cache:
+                uncached[key] = gene
         #use multiprocessing to speed up
-        pool = mp.Pool(cpu_count)
-        result = pool.map(partial_get_fidelity_depth, random_gene)
-        #mkdir ist_generation
-        result=np.array(result,dtype=object)
-        pool.close()
+        chunksize = max(1,len(uncached)//cpu_count)
+        for key,r in zip(uncached.keys(),pool.imap(partial_get_fidelity_depth, uncached.values(), chunksize=chunksize)):
+            cache[key] = r
+        _save_cache(cache,kwargs)
+        result = _collect_result([cache[key] for key in keys])
         #save the result
         index=_get_index(result,threshold=threshold)
-        print(f'depth:{result[index,1]}\nfidelity:{result[index,0]}')
+        print(f'depth:{result["depth"][index]}\nfidelity:{result["fidelity"][index]}')
         _save_data(result,random_gene,i,target_statevector,index,num_qubit,kwargs)
         random_gene = _get_child_gene(random_gene,_get_parent_gene(random_gene,index),index,kwargs)
         print(f'generation {i} finished')
-        record_depth[i%10] = np.array(result[index,1])
+        record_depth[i%10] = np.array(result['depth'][index])
         if len(record_depth[i%10])<10:
             #fill 1e10 to the array
             record_depth[i%10] = np.concatenate((record_depth[i%10],np.ones(10-len(record_depth[i%10]))*1e10))
@@ -474,6 +645,8 @@ def GA(target_statevector : np.ndarray ,num_qubit : int ,**kwargs):
             std = np.std(r)
             if std<1e-3:
                 break
+    pool.close()
+    pool.join()
 
 
 
@@ -12,7 +12,7 @@ dependencies:
     matplotlib
 
 results structure:
-    result = [[fidelity, depth, theta], [fidelity, depth, theta], ...]
+    result = {'fidelity':[fidelity, ...], 'depth':[depth, ...], 'theta':[theta, ...]}
 
 genes structure:
     genes = [[gene], [gene], ...]
@@ -28,8 +28,7 @@ def draw_prob_distribution(gene : list,
                            theta : list|np.ndarray, 
                            num_qubit : int, 
                            target_distribution : list|np.ndarray, 
-                           filename:str,
-                           method : str = 'qasm') -> None:
+                           filename:str) -> None:
     '''
     Draw the probability distribution of a circuit and the target distribution
     Args:
@@ -38,12 +37,11 @@ def draw_prob_distribution(gene : list,
         num_qubit: number of qubits
         target_distribution: the target distribution
         filename: the filename of the picture
-        method: the method to get the probability distribution
     Returns:
         None
     '''
     circuit = Gene_Circuit(gene, num_qubit).circuit
-    prob_distribution = get_prob_distribution(circuit, theta,method=method)
+    prob_distribution = get_prob_distribution(circuit, theta)
     plt.clf()
     plt.bar(range(2**num_qubit), prob_distribution)
     plt.plot(np.arange(2**num_qubit), target_distribution, label='target_distribution')
@@ -52,7 +50,7 @@ def draw_prob_distribution(gene : list,
     plt.close()
 
 
-def load_results_from_file(filename:str)->np.ndarray:
+def load_results_from_file(filename:str)->dict:
     '''
     Load the results from a file
     Args:
@@ -60,7 +58,8 @@ def load_results_from_file(filename:str)->np.ndarray:
     Returns:
         result: the result
     '''
-    result = np.load(filename, allow_pickle=True)
+    with np.load(filename, allow_pickle=True) as data:
+        result = {key:data[key] for key in data.files}
     return result
 
 def load_genes_from_file(filename:str)->np.ndarray:
@@ -123,14 +122,14 @@ def draw_prob_distribution_from_result(path : str,
     os.makedirs(f'{path}/{expriement}/smallest_distribution',exist_ok=True)
     results = {}
     for i in range(generation_number) :
-        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npy'
+        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npz'
         result = load_results_from_file(filename)
         results[i] = result
     # print(results)
     for i in range(generation_number):
         if i == 1:
             continue
-        theta = results[i][0,2]
+        theta = results[i]['theta'][0]
         gene = genes[i][0]
 
         draw_prob_distribution(gene, theta, num_qubit, target_distribution, 
@@ -150,12 +149,12 @@ def draw_fidelity_change_from_result(path : str,
     '''
     results = {}
     for i in range(generation_number) :
-        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npy'
+        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npz'
         result = load_results_from_file(filename)
         results[i] = result
     fidelity_change = []
     for i in range(generation_number):
-        fidelity_change.append(sum(results[i][:,0])/len(results[i][:,0]))
+        fidelity_change.append(np.mean(results[i]['fidelity']))
     plt.clf()
     plt.plot(range(generation_number), fidelity_change)
     plt.savefig(f'{path}/{expriement}/fidelity_change.png')
@@ -177,12 +176,12 @@ def draw_depth_change_from_result(path : str,
     '''
     results = {}
     for i in range(generation_number) :
-        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npy'
+        filename = f'{path}/{expriement}/{i}st_generation/10_smallest_depth_result.npz'
         result = load_results_from_file(filename)
         results[i] = result
     depth_change = []
     for i in range(generation_number):
-        depth_change.append(sum(results[i][:,1])/len(results[i][:,1]))
+        depth_change.append(np.mean(results[i]['depth']))
     plt.clf()
     plt.plot(range(generation_number), depth_change)
     if save_path is None:
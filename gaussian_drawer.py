@@ -50,7 +50,7 @@ for i,o in enumerate(experiment):
     num_qubit=5
     _target_distribution=target_distribution[i]
     drawer.draw_prob_distribution(_gene,theta,num_qubit,_target_distribution,
-                                  file_name_distribution,method='statevector')
+                                  file_name_distribution)
     #check generation number
     check_path = f'{path}/{o}'
     generation_number = 0
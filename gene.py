@@ -13,6 +13,146 @@ dependencies:
 
 import qiskit as qk
 import numpy as np
+from qiskit.circuit.library import CXGate
+from qiskit.transpiler import PassManager
+from qiskit.transpiler.passes import InverseCancellation
+
+#cancel adjacent cx gates which act on the same qubits
+_CX_CANCELLATION = PassManager([InverseCancellation([CXGate()])])
+
+#matrices of the gates without parameter
+_FIXED_GATES = {'h':np.array([[1,1],[1,-1]],dtype=complex)/np.sqrt(2),
+                'x':np.array([[0,1],[1,0]],dtype=complex),
+                'sx':np.array([[1+1j,1-1j],[1-1j,1+1j]],dtype=complex)/2}
+
+def _rotation_matrix(gate : str, angle : np.ndarray) -> np.ndarray:
+    '''
+    get the matrices of a rotation gate
+    Args:
+        gate: rx, ry or rz
+        angle: a array of the rotation angles with shape (batch,)
+    Returns:
+        matrix: a complex array with shape (batch, 2, 2)
+    '''
+    c = np.cos(np.asarray(angle)/2)
+    s = np.sin(np.asarray(angle)/2)
+    matrix = np.zeros(c.shape+(2,2), dtype=complex)
+    if gate == 'rx':
+        matrix[...,0,0], matrix[...,0,1], matrix[...,1,0], matrix[...,1,1] = c, -1j*s, -1j*s, c
+    elif gate == 'ry':
+        matrix[...,0,0], matrix[...,0,1], matrix[...,1,0], matrix[...,1,1] = c, -s, s, c
+    elif gate == 'rz':
+        matrix[...,0,0], matrix[...,1,1] = c-1j*s, c+1j*s
+    else:
+        raise ValueError(f'{gate} is not a rotation gate')
+    return matrix
+
+def _apply_single_qubit_gate(state : np.ndarray, matrix : np.ndarray, axis : int) -> np.ndarray:
+    '''
+    apply a (2, 2) or (batch, 2, 2) matrix on one axis of a state with shape (batch,)+(2,)*num_qubit
+    '''
+    state = np.moveaxis(state, axis, 1)
+    shape = state.shape
+    state = np.matmul(matrix, state.reshape(shape[0], 2, -1)).reshape(shape)
+    return np.moveaxis(state, 1, axis)
+
+def _apply_cx(state : np.ndarray, control : int, target : int) -> np.ndarray:
+    '''
+    apply a cx gate on a state with shape (batch,)+(2,)*num_qubit, control and target are axes of the state
+    '''
+    index = [slice(None)]*state.ndim
+    index[control] = 1
+    index = tuple(index)
+    #the control axis is removed after indexing
+    axis = target if target < control else target-1
+    state[index] = np.flip(state[index], axis=axis).copy()
+    return state
+
+
+class _Circuit_Builder(object):
+    '''
+    build the circuit of a gene gate by gate, and keep the generating rule of each qubit
+
+    Methods:
+        empty, rx, ry, rz, cx, h, x, sx: add the gate G_ij on qubit i, with signature (i, control)
+    '''
+    def __init__(self, num_qubit : int) -> None:
+        '''
+        Args:
+            num_qubit: number of qubits
+        '''
+        self.num_qubit = num_qubit
+        self.circuit = qk.QuantumCircuit(num_qubit)
+        self.last_gate = ['empty' for i in range(num_qubit)]
+        self.count_rgate = [0 for i in range(num_qubit)]
+        self.theta_index = 0
+
+    def _rotation_parameter(self, gate : str, i : int) -> qk.circuit.Parameter|None:
+        '''
+        get the parameter of a new rotation gate on qubit i
+        return None if the rule do not allow the gate (same rotation gate or more than three rotation gates continuously)
+        '''
+        if gate == self.last_gate[i] or self.count_rgate[i]>=3:
+            return None
+        self.last_gate[i] = gate
+        self.count_rgate[i] += 1
+        self.theta_index += 1
+        return qk.circuit.Parameter(f'theta_{self.theta_index-1}')
+
+    def _allow_fixed(self, gate : str, i : int) -> bool:
+        '''
+        check if the rule allow a gate without parameter on qubit i (no same gate continuously)
+        '''
+        if gate == self.last_gate[i]:
+            return False
+        self.last_gate[i] = gate
+        self.count_rgate[i] = 0
+        return True
+
+    def empty(self, i : int, control : int) -> None:
+        pass
+
+    def rx(self, i : int, control : int) -> None:
+        parameter = self._rotation_parameter('rx', i)
+        if parameter is not None:
+            self.circuit.rx(parameter, i)
+
+    def ry(self, i : int, control : int) -> None:
+        parameter = self._rotation_parameter('ry', i)
+        if parameter is not None:
+            self.circuit.ry(parameter, i)
+
+    def rz(self, i : int, control : int) -> None:
+        parameter = self._rotation_parameter('rz', i)
+        if parameter is not None:
+            self.circuit.rz(parameter, i)
+
+    def cx(self, i : int, control : int) -> None:
+        control = int(control % self.num_qubit)
+        if control == i:
+            return
+        self.circuit.cx(control, i)
+        self.last_gate[control] = 'empty'
+        self.last_gate[i] = 'cx'
+        self.count_rgate[control] = 0
+        self.count_rgate[i] = 0
+
+    def h(self, i : int, control : int) -> None:
+        if self._allow_fixed('h', i):
+            self.circuit.h(i)
+
+    def x(self, i : int, control : int) -> None:
+        if self._allow_fixed('x', i):
+            self.circuit.x(i)
+
+    def sx(self, i : int, control : int) -> None:
+        if self._allow_fixed('sx', i):
+            self.circuit.sx(i)
+
+#gene_gates is a list of gates use to generate the circuit
+_GENE_GATES = ['empty','empty','empty','rx','ry','rz','cx']
+#the method of _Circuit_Builder for each gate index G_ij[0]
+_GATE_BUILDERS = [getattr(_Circuit_Builder, gate) for gate in _GENE_GATES]
 
 
 class Gene_Circuit(object):
@@ -27,21 +167,24 @@ class Gene_Circuit(object):
     def __init__(self,gene,num_qubit) -> None:
         '''
         Args:
-            gene: a array with shape (num_qubit, length_gene) with element called G_ij
+            gene: a array with shape (num_qubit, length_gene, 2) with element called G_ij
             num_qubit: number of qubits
         
         object:
-            self.gene: a array with shape (num_qubit, length_gene) with element called G_ij
+            self.gene: a array with shape (num_qubit, length_gene, 2) with element called G_ij
             self.num_qubit: number of qubits
             self.circuit: a quantum circuit with num_qubit qubits generated from gene
             self.draw: draw the circuit
+            self.operations: the gates of self.circuit used by self.statevector
         '''
         self.gene = gene
         self.num_qubit = num_qubit
-        self.circuit = qk.transpile(self.generate_circuit_from_gene())
+        #the gene only use rx, ry, rz, cx, the only work of a full transpile is cancel the adjacent cx pairs
+        self.circuit = _CX_CANCELLATION.run(self.generate_circuit_from_gene())
         self.draw = self.circuit.draw
         self.num_parameters = self.circuit.num_parameters
         self.depth = self.circuit.depth
+        self.operations = self.compile_operations()
 
     def bind_parameters(self, theta : list|np.ndarray) -> qk.QuantumCircuit:
         '''
@@ -51,14 +194,64 @@ class Gene_Circuit(object):
         Returns:
             bind_circuit: a quantum circuit with parameter binded
         '''
-        binded_circuit = self.circuit.bind_parameters({self.circuit.parameters[i]:theta[i] for i in range(len(theta))})
+        #assign by position, the order of theta follows self.circuit.parameters
+        binded_circuit = self.circuit.assign_parameters(theta, inplace=False)
         return binded_circuit
 
+    def compile_operations(self) -> list:
+        '''
+        compile the circuit to a list of operations for self.statevector
+        Returns:
+            operations: a list of tuple(gate, qubits, parameter)
+                        qubits is a tuple of the index of the qubits of the gate
+                        parameter is the index of the parameter in self.circuit.parameters, None if the gate have no parameter
+        Raises:
+            ValueError: if the circuit have gate other than rx, ry, rz, cx, h, x, sx
+        '''
+        parameters = list(self.circuit.parameters)
+        operations = []
+        for instruction in self.circuit.data:
+            gate = instruction.operation.name
+            qubits = tuple(self.circuit.find_bit(qubit).index for qubit in instruction.qubits)
+            if gate in ['rx','ry','rz']:
+                operations.append((gate, qubits, parameters.index(instruction.operation.params[0])))
+            elif gate in ['cx','h','x','sx']:
+                operations.append((gate, qubits, None))
+            else:
+                raise ValueError(f'{gate} is not supported')
+        return operations
+
+    def statevector(self, theta : list|np.ndarray) -> np.ndarray:
+        '''
+        get the statevector of the circuit with numpy, without building a binded circuit
+        the order of the statevector follows qiskit (qubit 0 is the least significant bit)
+        Args:
+            theta: a list of theta, or a array of theta with shape (batch, num_parameters)
+        Returns:
+            statevector: the statevector of the circuit, with shape (batch, 2**num_qubit) if theta is a batch
+        '''
+        thetas = np.atleast_2d(np.asarray(theta, dtype=float))
+        n = self.num_qubit
+        state = np.zeros((len(thetas),)+(2,)*n, dtype=complex)
+        state[(slice(None),)+(0,)*n] = 1
+        #the axis 0 is the batch, qubit i is the axis n-i of the state
+        for gate, qubits, parameter in self.operations:
+            if gate == 'cx':
+                state = _apply_cx(state, n-qubits[0], n-qubits[1])
+            elif parameter is None:
+                state = _apply_single_qubit_gate(state, _FIXED_GATES[gate], n-qubits[0])
+            else:
+                state = _apply_single_qubit_gate(state, _rotation_matrix(gate, thetas[:,parameter]), n-qubits[0])
+        state = state.reshape(len(thetas), -1)
+        if np.ndim(theta) == 2:
+            return state
+        return state[0]
+
     def generate_circuit_from_gene(self)->qk.QuantumCircuit:
         '''
         Generate a quantum circuit with num_qubit qubits
         Args:
-            self.gene: a array with shape (num_qubit, length_gene) with element called G_ij
+            self.gene: a array with shape (num_qubit, length_gene, 2) with element called G_ij
             self.num_qubit: number of qubits
         Returns:
             circuit: a quantum circuit
@@ -82,44 +275,14 @@ class Gene_Circuit(object):
 
         '''
         
-        #gene_gates is a list of gates use to generate the circuit
-        gene_gates = ['empty','empty','empty','rx','ry','rz','cx']
-        theta_index = 0
-        circuit = qk.QuantumCircuit(self.num_qubit)
+        #gene_gates is _GENE_GATES, each gate index is dispatched to a method of _Circuit_Builder
+        builder = _Circuit_Builder(self.num_qubit)
         gene = self.gene
         gene = gene.transpose(1,0,2)
-        temp_last_gate = ['empty' for i in range(self.num_qubit)]
-        count_rgate = [0 for i in range(self.num_qubit)]
-        for j,G_nj in enumerate(gene):
+        for G_nj in gene:
             for i,G_ij in enumerate(G_nj):
-                gate = gene_gates[G_ij[0]]
-                if gate == temp_last_gate[i] and gate in ['rx','ry','rz','h','x','sx']:
-                    continue
-                control = G_ij[1]
-                if control >= self.num_qubit:
-                    control = control % self.num_qubit
-                if gate == 'empty':
-                    continue
-                elif gate in ['rx','ry','rz']:
-                    if count_rgate[i]>=3:
-                        continue
-                    getattr(circuit,gate)(qk.circuit.Parameter(f'theta_{theta_index}'),i)
-                    temp_last_gate[i] = gate
-                    count_rgate[i]+=1
-                    theta_index+=1
-                elif gate == 'cx':
-                    if control == i:
-                        continue
-                    else:
-                        circuit.cx(control,i)
-                        temp_last_gate[control] = 'empty'
-                        temp_last_gate[i] = gate
-                        count_rgate[control] = 0
-                        count_rgate[i] = 0
-                elif gate in ['h','x','sx']:
-                    getattr(circuit,gate)(i)
-                    temp_last_gate[i] = gate
-                    count_rgate[i] = 0
+                _GATE_BUILDERS[G_ij[0]](builder, i, G_ij[1])
+        circuit = builder.circuit
         # circuit.draw("mpl",filename='test3.png')
         return circuit
     